@@ -4,17 +4,27 @@ from dotenv import load_dotenv
 from models import PatientContext
 from rag_system import MedicalRAGSystem
 from doctor_interface import DoctorInterface
+from cache import ResponseCache
+from json_provider import ORJSONProvider
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Initialize system
 api_key = os.getenv("GROQ_API_KEY") or os.getenv("OPENAI_API_KEY")
 model = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
-base_url = "https://api.groq.com/openai/v1" if os.getenv("GROQ_API_KEY") else None
+if os.getenv("GROQ_API_KEY"):
+    base_url = os.getenv("GROQ_BASE_URL") or "https://api.groq.com/openai/v1"
+else:
+    base_url = os.getenv("OPENAI_BASE_URL") or None
 rag_system = MedicalRAGSystem(api_key, model, base_url) if api_key else None
 doctor_interface = DoctorInterface()
+response_cache = ResponseCache(
+    ttl=int(os.getenv("CACHE_TTL", "3600")),
+    redis_url=os.getenv("REDIS_URL")
+)
 
 # Medical knowledge base
 MEDICAL_KNOWLEDGE = [
@@ -53,6 +63,11 @@ def analyze():
         literacy = data.get('literacy', 'medium')
         conditions = data.get('conditions', [])
         
+        cache_key = response_cache.make_key("analyze", model, report_text, age, literacy, conditions)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+        
         patient = PatientContext(
             age=age,
             medical_literacy=literacy,
@@ -61,7 +76,7 @@ def analyze():
         
         result = rag_system.process_report(report_text, patient)
         
-        return jsonify({
+        payload = {
             'summary': result.summary,
             'explanation': result.personalized_explanation,
             'findings': [
@@ -75,7 +90,9 @@ def analyze():
             'confidence': result.confidence_score,
             'uncertainties': result.uncertainty_notes,
             'requires_review': result.requires_doctor_review
-        })
+        }
+        response_cache.set(cache_key, payload)
+        return jsonify(payload)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -91,6 +108,11 @@ def ask():
         literacy = data.get('literacy', 'medium')
         conditions = data.get('conditions', [])
         
+        cache_key = response_cache.make_key("ask", model, question, age, literacy, conditions)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+        
         patient = PatientContext(
             age=age,
             medical_literacy=literacy,
@@ -99,14 +121,20 @@ def ask():
         
         answer, confidence, sources, uncertainties = rag_system.answer_question(question, patient)
         
-        return jsonify({
+        payload = {
             'answer': answer,
             'confidence': confidence,
             'sources': sources,
             'uncertainties': uncertainties
-        })
+        }
+        response_cache.set(cache_key, payload)
+        return jsonify(payload)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=True)
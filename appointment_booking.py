@@ -1,10 +1,55 @@
+import functools
 import os
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, List, Tuple
+
+_BOOK_RE = re.compile(
+    r"book appointment|schedule appointment|see a doctor|need appointment|want to consult"
+    r"|visit doctor|book doctor|appointment|consultation",
+    re.IGNORECASE
+)
+
+SLOT_HOURS = (9, 10, 11, 14, 15, 16, 17)
+MAX_SLOTS = 10
+
+@functools.lru_cache(maxsize=8)
+def _slot_skeleton(today: date, days_ahead: int) -> Tuple[Tuple[str, str, str], ...]:
+    """(date, day name, time) triples for the next weekdays; keyed on today so it rolls over daily"""
+    slots = []
+    start_date = today + timedelta(days=1)
+    for day in range(days_ahead):
+        slot_date = start_date + timedelta(days=day)
+        if slot_date.weekday() < 5:  # Monday to Friday
+            date_str = slot_date.strftime("%Y-%m-%d")
+            day_name = slot_date.strftime("%A")
+            slots.extend((date_str, day_name, f"{hour:02d}:00") for hour in SLOT_HOURS)
+        if len(slots) >= MAX_SLOTS:
+            break
+    return tuple(slots[:MAX_SLOTS])
 
 class AppointmentBooking:
     """Handles appointment booking through Chronic Care"""
     
+    # Map conditions to specialties
+    CONDITION_MAP = {
+        "diabetes": "Endocrinologist",
+        "hypertension": "Cardiologist",
+        "heart": "Cardiologist",
+        "asthma": "Pulmonologist",
+        "breathing": "Pulmonologist",
+        "skin": "Dermatologist",
+        "joint": "Orthopedic",
+        "stomach": "Gastroenterologist",
+        "headache": "Neurologist"
+    }
+    # Longest keys first so the alternation prefers the most specific term. ASCII
+    # case folding only, so every match lowercases back to a CONDITION_MAP key.
+    SPECIALTY_RE = re.compile(
+        "|".join(map(re.escape, sorted(CONDITION_MAP, key=len, reverse=True))),
+        re.IGNORECASE | re.ASCII
+    )
+    
     def __init__(self):
         self.appointments = []  # In production, use database
         self.available_specialties = [
@@ -20,59 +65,25 @@ class AppointmentBooking:
     
     def detect_booking_intent(self, message: str) -> bool:
         """Check if user wants to book appointment"""
-        booking_keywords = [
-            "book appointment", "schedule appointment", "see a doctor",
-            "need appointment", "want to consult", "visit doctor",
-            "book doctor", "appointment", "consultation"
-        ]
-        return any(keyword in message.lower() for keyword in booking_keywords)
+        return _BOOK_RE.search(message) is not None
     
     def suggest_specialty(self, symptoms: List[str], conditions: List[str]) -> str:
         """Suggest appropriate specialty based on symptoms/conditions"""
         
-        # Map conditions to specialties
-        condition_map = {
-            "diabetes": "Endocrinologist",
-            "hypertension": "Cardiologist",
-            "heart": "Cardiologist",
-            "asthma": "Pulmonologist",
-            "breathing": "Pulmonologist",
-            "skin": "Dermatologist",
-            "joint": "Orthopedic",
-            "stomach": "Gastroenterologist",
-            "headache": "Neurologist"
-        }
-        
-        # Check conditions first
-        for condition in conditions:
-            if condition.lower() in condition_map:
-                return condition_map[condition.lower()]
-        
-        # Check symptoms
-        for symptom in symptoms:
-            for key, specialty in condition_map.items():
-                if key in symptom.lower():
-                    return specialty
+        # Check conditions first, then symptoms
+        for text in [*conditions, *symptoms]:
+            match = self.SPECIALTY_RE.search(text)
+            if match:
+                return self.CONDITION_MAP[match.group(0).lower()]
         
         return "General Physician"
     
     def get_available_slots(self, specialty: str, days_ahead: int = 7) -> List[Dict]:
         """Get available appointment slots"""
-        slots = []
-        start_date = datetime.now() + timedelta(days=1)
-        
-        for day in range(days_ahead):
-            date = start_date + timedelta(days=day)
-            if date.weekday() < 5:  # Monday to Friday
-                for hour in [9, 10, 11, 14, 15, 16, 17]:
-                    slots.append({
-                        "date": date.strftime("%Y-%m-%d"),
-                        "time": f"{hour:02d}:00",
-                        "specialty": specialty,
-                        "available": True
-                    })
-        
-        return slots[:10]  # Return first 10 slots
+        return [
+            {"date": slot_date, "day_name": day_name, "time": slot_time, "specialty": specialty, "available": True}
+            for slot_date, day_name, slot_time in _slot_skeleton(datetime.now().date(), days_ahead)
+        ]
     
     def format_booking_response(self, specialty: str, slots: List[Dict]) -> str:
         """Format booking information for user"""
@@ -80,8 +91,7 @@ class AppointmentBooking:
         response += "Available slots:\n\n"
         
         for i, slot in enumerate(slots[:5], 1):
-            date_obj = datetime.strptime(slot['date'], "%Y-%m-%d")
-            day_name = date_obj.strftime("%A")
+            day_name = slot.get('day_name') or datetime.strptime(slot['date'], "%Y-%m-%d").strftime("%A")
             response += f"{i}. {day_name}, {slot['date']} at {slot['time']}\n"
         
         response += "\n📞 **To confirm your appointment:**\n"
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Iterable, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+class ResponseCache:
+    """TTL cache for endpoint responses, backed by Redis when available"""
+
+    def __init__(
+        self,
+        ttl: int = 3600,
+        redis_url: str | None = None,
+        prefix: str = "drgroq:",
+        max_entries: int = 10000
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._client = None
+        self._local = {}
+        self._lock = threading.Lock()
+
+        # Fall back to an in-process store when Redis isn't installed or reachable.
+        if redis_url and redis is not None:
+            try:
+                client = redis.Redis.from_url(redis_url)
+                client.ping()
+                self._client = client
+            except Exception:
+                self._client = None
+
+    def make_key(
+        self,
+        kind: str,
+        model: str,
+        text: str,
+        age: int,
+        literacy: str,
+        conditions: Iterable[str]
+    ) -> str:
+        """Build a cache key from normalized request inputs"""
+        normalized_text = re.sub(r"\s+", " ", text).strip().lower()
+        raw = "|".join([
+            kind,
+            model,
+            normalized_text,
+            str(age),
+            str(literacy),
+            ",".join(sorted(str(c).strip().lower() for c in conditions))
+        ])
+        return self.prefix + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return cached response or None"""
+        value = None
+        if self._client is not None:
+            try:
+                raw = self._client.get(key)
+                value = json.loads(raw) if raw else None
+            except Exception:
+                value = None
+        else:
+            with self._lock:
+                entry = self._local.get(key)
+                if entry and entry[0] > time.monotonic():
+                    value = entry[1]
+                elif entry:
+                    del self._local[key]
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict):
+        """Store response with TTL"""
+        if self._client is not None:
+            try:
+                self._client.setex(key, self.ttl, json.dumps(value))
+            except Exception:
+                pass
+            return
+        with self._lock:
+            if key not in self._local and len(self._local) >= self.max_entries:
+                # Dicts keep insertion order, so the first key is the oldest entry.
+                del self._local[next(iter(self._local))]
+            self._local[key] = (time.monotonic() + self.ttl, value)
+
+    def stats(self) -> dict:
+        """Hit/miss counters"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": "redis" if self._client is not None else "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._local) if self._client is None else None
+            }
@@ -4,22 +4,27 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 from medical_chatbot import MedicalChatbot
 from appointment_booking import AppointmentBooking
+from session_store import ShardedSessionMap
+from json_provider import ORJSONProvider
 import uuid
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)  # Enable CORS for Android app
 
-# Store chatbot instances per session
-chatbot_sessions = {}
+SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+
+# Store chatbot instances per session; idle sessions expire after SESSION_TTL
+chatbot_sessions = ShardedSessionMap(maxsize=MAX_SESSIONS, ttl=SESSION_TTL)
 booking = AppointmentBooking()
 
 def get_or_create_chatbot(session_id):
-    """Get existing chatbot or create new one for session"""
-    if session_id not in chatbot_sessions:
-        chatbot_sessions[session_id] = MedicalChatbot()
-    return chatbot_sessions[session_id]
+    """Get existing chatbot or create new one"""
+    # New chatbots are cheap: they share the process-wide LLM client.
+    return chatbot_sessions.get_or_create(session_id, MedicalChatbot)
 
 @app.route('/')
 def index():
@@ -93,11 +98,10 @@ def api_get_chat(session_id):
     }
     """
     try:
-        if session_id not in chatbot_sessions:
+        chatbot = chatbot_sessions.get(session_id)
+        if chatbot is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        chatbot = chatbot_sessions[session_id]
-        
         return jsonify({
             'session_id': session_id,
             'conversation_history': chatbot.conversation_history,
@@ -115,8 +119,7 @@ def api_delete_chat(session_id):
     Response: {"status": "ok"}
     """
     try:
-        if session_id in chatbot_sessions:
-            del chatbot_sessions[session_id]
+        chatbot_sessions.pop(session_id)
         return jsonify({'status': 'ok'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -188,9 +191,10 @@ def chat():
 def reset():
     """Web UI reset endpoint"""
     session_id = 'web-session'
-    if session_id in chatbot_sessions:
-        chatbot_sessions[session_id].reset()
+    chatbot = chatbot_sessions.get(session_id)
+    if chatbot:
+        chatbot.reset()
     return jsonify({'status': 'ok'})
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    app.run(debug=True, port=5000, host='0.0.0.0', threaded=True)
@@ -1,46 +1,107 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from collections import OrderedDict, deque
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 from models import ExplanationOutput
 
+ARCHIVE_SIZE = 10000
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, event name and structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "event": record.getMessage(),
+            **getattr(record, "fields", {})
+        }
+        return json.dumps(entry, default=str)
+
+# Review events are written off the request thread: the logger only enqueues,
+# and a background listener does the file I/O.
+logger = logging.getLogger("doctor")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.Queue(-1)
+_file_handler = logging.FileHandler(os.getenv("DOCTOR_LOG_FILE", "doctor_reviews.jsonl"), delay=True)
+_file_handler.setFormatter(JsonFormatter())
+_listener = QueueListener(_log_queue, _file_handler)
+_listener.start()
+atexit.register(_listener.stop)
+logger.addHandler(QueueHandler(_log_queue))
+
 class DoctorInterface:
     """Human-in-the-loop verification interface"""
-    
-    def __init__(self):
-        self.pending_reviews = []
-    
+
+    def __init__(self, echo: bool = False):
+        self.echo = echo  # also print reviews to the console (CLI demo)
+        self.pending_reviews = OrderedDict()  # report_id -> review, in submission order
+        self.archived = deque(maxlen=ARCHIVE_SIZE)  # most recent completed reviews
+
     def submit_for_review(self, report_id: str, output: ExplanationOutput):
         """Submit AI output for doctor review"""
-        self.pending_reviews.append({
+        self.pending_reviews[report_id] = {
             "report_id": report_id,
             "output": output,
             "status": "pending"
-        })
-        print(f"\n{'='*60}")
-        print(f"DOCTOR REVIEW REQUIRED - Report ID: {report_id}")
-        print(f"{'='*60}")
-        print(f"Reason: {'Critical findings' if any(f.severity == 'critical' for f in output.findings) else 'Low confidence'}")
-        print(f"Confidence Score: {output.confidence_score:.2f}")
-        print(f"\nAI Summary: {output.summary}")
-        print(f"\nFindings:")
-        for f in output.findings:
-            print(f"  - [{f.severity.upper()}] {f.finding}: {f.value or 'N/A'}")
-        print(f"\nAI Explanation:\n{output.personalized_explanation}")
-        print(f"\nUncertainties:")
-        for u in output.uncertainty_notes:
-            print(f"  - {u}")
-        print(f"{'='*60}\n")
-    
+        }
+        reason = 'Critical findings' if any(f.severity == 'critical' for f in output.findings) else 'Low confidence'
+        logger.info("review_submitted", extra={"fields": {
+            "report_id": report_id,
+            "reason": reason,
+            "confidence": output.confidence_score,
+            "summary": output.summary,
+            "findings": [
+                {"finding": f.finding, "value": f.value, "severity": f.severity}
+                for f in output.findings
+            ],
+            "uncertainties": output.uncertainty_notes
+        }})
+        if self.echo:
+            print(self._format_review(report_id, reason, output))
+
+    def _format_review(self, report_id: str, reason: str, output: ExplanationOutput) -> str:
+        """Human-readable review block"""
+        lines = [
+            f"\n{'='*60}",
+            f"DOCTOR REVIEW REQUIRED - Report ID: {report_id}",
+            f"{'='*60}",
+            f"Reason: {reason}",
+            f"Confidence Score: {output.confidence_score:.2f}",
+            f"\nAI Summary: {output.summary}",
+            f"\nFindings:"
+        ]
+        lines += [f"  - [{f.severity.upper()}] {f.finding}: {f.value or 'N/A'}" for f in output.findings]
+        lines.append(f"\nAI Explanation:\n{output.personalized_explanation}")
+        lines.append(f"\nUncertainties:")
+        lines += [f"  - {u}" for u in output.uncertainty_notes]
+        lines.append(f"{'='*60}\n")
+        return "\n".join(lines)
+
     def doctor_verify(self, report_id: str, approved: bool, notes: Optional[str] = None):
         """Doctor verification"""
-        for review in self.pending_reviews:
-            if review["report_id"] == report_id:
-                review["status"] = "approved" if approved else "rejected"
-                review["output"].doctor_notes = notes
-                print(f"Report {report_id} {'APPROVED' if approved else 'REJECTED'} by doctor")
-                if notes:
-                    print(f"Doctor notes: {notes}")
-                return review["output"]
-        return None
-    
+        review = self.pending_reviews.pop(report_id, None)
+        if review is None:
+            return None
+        review["status"] = "approved" if approved else "rejected"
+        review["output"].doctor_notes = notes
+        self.archived.append(review)
+        logger.info("review_verified", extra={"fields": {
+            "report_id": report_id,
+            "status": review["status"],
+            "notes": notes
+        }})
+        if self.echo:
+            print(f"Report {report_id} {'APPROVED' if approved else 'REJECTED'} by doctor")
+            if notes:
+                print(f"Doctor notes: {notes}")
+        return review["output"]
+
     def get_pending_reviews(self):
         """Get all pending reviews"""
-        return [r for r in self.pending_reviews if r["status"] == "pending"]
+        return list(self.pending_reviews.values())
@@ -2,6 +2,10 @@ import re
 from typing import List, Dict
 from models import MedicalFinding
 
+# Pattern: Test Name: Value (Range)
+_FINDING_RE = re.compile(r'([A-Za-z\s]+):\s*([0-9.]+)\s*(?:\(([0-9.\-\s]+)\))?')
+_OBSERVATION_RE = re.compile(r'shows|indicates|reveals', re.IGNORECASE)
+
 class ReportExtractor:
     """Extract structured information from medical reports"""
     
@@ -11,17 +15,20 @@ class ReportExtractor:
         "normal": ["normal", "within range", "stable"]
     }
     
+    # keyword -> severity, so a report is scanned for every keyword just once
+    SEVERITY_INDEX = {kw: severity for severity, kws in SEVERITY_KEYWORDS.items() for kw in kws}
+    
     def extract_findings(self, report_text: str) -> List[MedicalFinding]:
         """Extract key findings from report"""
         findings = []
         
-        # Pattern: Test Name: Value (Range)
-        pattern = r'([A-Za-z\s]+):\s*([0-9.]+)\s*(?:\(([0-9.\-\s]+)\))?'
-        matches = re.findall(pattern, report_text)
+        matches = _FINDING_RE.findall(report_text)
+        # Lab findings are graded against the whole report, so scan it once.
+        report_hits = self._scan_severities(report_text)
         
         for match in matches:
             test_name, value, normal_range = match
-            severity = self._determine_severity(report_text, test_name)
+            severity = self._pick_severity(report_hits | self._scan_severities(test_name))
             
             findings.append(MedicalFinding(
                 category="lab_test",
@@ -35,7 +42,7 @@ class ReportExtractor:
         # Extract text-based findings
         sentences = report_text.split('.')
         for sent in sentences:
-            if any(kw in sent.lower() for kw in ["shows", "indicates", "reveals"]):
+            if _OBSERVATION_RE.search(sent):
                 severity = self._determine_severity(sent, "")
                 findings.append(MedicalFinding(
                     category="observation",
@@ -48,9 +55,16 @@ class ReportExtractor:
     
     def _determine_severity(self, text: str, context: str) -> str:
         """Determine severity from text"""
-        text_lower = (text + " " + context).lower()
-        
-        for severity, keywords in self.SEVERITY_KEYWORDS.items():
-            if any(kw in text_lower for kw in keywords):
+        return self._pick_severity(self._scan_severities(text) | self._scan_severities(context))
+    
+    def _scan_severities(self, text: str) -> set:
+        """Severity classes whose keywords appear in text"""
+        text_lower = text.lower()
+        return {severity for kw, severity in self.SEVERITY_INDEX.items() if kw in text_lower}
+    
+    def _pick_severity(self, hits: set) -> str:
+        """Highest-priority severity among hits"""
+        for severity in self.SEVERITY_KEYWORDS:
+            if severity in hits:
                 return severity
         return "normal"
@@ -0,0 +1,17 @@
+import os
+
+# Usage: gunicorn app:app -c gunicorn_conf.py
+#        gunicorn chatbot_app:app -c gunicorn_conf.py
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Threaded workers: each request thread just waits on the shared LLM scheduler,
+# so one process can hold many in-flight Groq calls. Chat sessions live in
+# process memory, so keep a single worker unless sessions are moved out.
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+
+# LLM calls can take several seconds; don't kill workers mid-request.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = 5
@@ -1,10 +1,116 @@
+import functools
+import hashlib
+import logging
 import os
-import re
+import threading
+from collections import OrderedDict
 from typing import List
+import numpy as np
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from onnx_embeddings import MINILM_MODEL_ID, OnnxMiniLMEmbeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_FILE = "embedding_cache.npz"
+MATRIX_FILE = "kb_matrix.npy"
+
+# Below this many chunks an exact flat scan is faster than an ANN graph.
+ANN_MIN_DOCS = int(os.getenv("KB_ANN_MIN_DOCS", "1000"))
+FAISS_THREADS = int(os.getenv("FAISS_THREADS", "0")) or os.cpu_count() or 1
+
+@functools.lru_cache(maxsize=1)
+def _configure_faiss():
+    """Let FAISS use every core for batched searches (once per process)"""
+    faiss = dependable_faiss_import()
+    faiss.omp_set_num_threads(FAISS_THREADS)
+    return faiss
+
+# Byte table keeping [a-z0-9] and blanking everything else; non-ASCII is
+# replaced with "?" on encode, so it splits tokens just like the regex did.
+_TOKEN_TABLE = bytes(c if chr(c) in "abcdefghijklmnopqrstuvwxyz0123456789" else 32 for c in range(256))
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase [a-z0-9]+ tokens, equivalent to re.findall(r"[a-z0-9]+", text.lower())"""
+    return text.lower().encode("ascii", "replace").translate(_TOKEN_TABLE).decode("ascii").split()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes vectors by sha1 of the text"""
+
+    def __init__(self, base: Embeddings, namespace: str = "", max_entries: int = 10000):
+        self.base = base
+        # Namespace the keys by model so a persisted cache is never reused across models.
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [hashlib.sha1((self.namespace + t).encode("utf-8")).hexdigest() for t in texts]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    vectors[key] = self._cache[key]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            # Encode all misses in a single batched forward pass.
+            fresh = self.base.embed_documents(list(missing.values()))
+            with self._lock:
+                for key, vec in zip(missing, fresh):
+                    # Stored as float16 to halve memory and disk footprint.
+                    vectors[key] = self._cache[key] = np.asarray(vec, dtype=np.float16)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        return [vectors[key].astype(np.float32).tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def save(self, path: str):
+        """Persist cached vectors to an .npz file"""
+        with self._lock:
+            if not self._cache:
+                return
+            keys = np.array(list(self._cache.keys()))
+            matrix = np.stack(list(self._cache.values()))
+        np.savez(path, keys=keys, vectors=matrix)
+
+    def load(self, path: str):
+        """Merge vectors from an .npz file into the cache"""
+        try:
+            data = np.load(path)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, vec in zip(data["keys"].tolist(), data["vectors"]):
+                self._cache.setdefault(key, vec)
+
+@functools.lru_cache(maxsize=1)
+def _embedder() -> CachedEmbeddings:
+    """Process-wide embedding model, loaded once and shared by every knowledge base"""
+    onnx_model = os.getenv("EMBEDDINGS_ONNX_MODEL")
+    if onnx_model:
+        try:
+            base = OnnxMiniLMEmbeddings(onnx_model, tokenizer_path=os.getenv("EMBEDDINGS_ONNX_TOKENIZER"))
+            return CachedEmbeddings(base, namespace=f"onnx:{onnx_model}|")
+        except Exception as e:
+            logger.warning("ONNX embeddings from %s unavailable, falling back to PyTorch: %s", onnx_model, e)
+    return CachedEmbeddings(HuggingFaceEmbeddings(
+        model_name=MINILM_MODEL_ID,
+        model_kwargs={"local_files_only": True},
+    ))
 
 class MedicalKnowledgeBase:
     """RAG knowledge base with medical sources"""
@@ -14,16 +120,20 @@ class MedicalKnowledgeBase:
         self.embeddings = None
         self.vectorstore = None
         self.documents = []
+        self.kb_matrix = None  # chunk embeddings (n_chunks, dim) for exact search on small corpora
+        self._kb_sq_norms = None
+        self._doc_terms = []
+        self._terms_by_text = {}
+        self._postings = {}
         self._fallback_mode = False
 
         # Prefer local-only HF model to avoid network dependency during demo.
         try:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
-                model_kwargs={"local_files_only": True},
-            )
+            self.embeddings = _embedder()
         except Exception:
             self._fallback_mode = True
+        else:
+            self.embeddings.load(os.path.join(persist_dir, EMBEDDING_CACHE_FILE))
         self.vectorstore = None
         
     def load_medical_sources(self, sources: List[str]):
@@ -37,40 +147,143 @@ class MedicalKnowledgeBase:
                 for i, src in enumerate(sources)]
         chunks = splitter.split_documents(docs)
         self.documents = chunks
+        self._build_term_index(chunks)
 
         if self.embeddings:
-            self.vectorstore = FAISS.from_documents(chunks, self.embeddings)
+            # Embed every chunk in one batch; the vectors feed both the FAISS index and kb_matrix.
+            vectors = np.asarray(
+                self.embeddings.embed_documents([c.page_content for c in chunks]),
+                dtype=np.float32
+            )
+            self._set_matrix(vectors if len(chunks) < ANN_MIN_DOCS else None)
+            self.vectorstore = self._build_vectorstore(chunks, vectors)
+
+    def _set_matrix(self, vectors: np.ndarray | None):
+        self.kb_matrix = vectors
+        self._kb_sq_norms = None if vectors is None else np.einsum("ij,ij->i", vectors, vectors)
+
+    def _build_vectorstore(self, chunks: List[Document], vectors: np.ndarray) -> FAISS:
+        """Flat index for small corpora, HNSW over 8-bit quantized vectors for large ones"""
+        faiss = _configure_faiss()
+        if len(chunks) < ANN_MIN_DOCS:
+            index = faiss.IndexFlatL2(vectors.shape[1])
+        else:
+            index = faiss.IndexHNSWSQ(vectors.shape[1], faiss.ScalarQuantizer.QT_8bit, 32)
+            index.train(vectors)
+        index.add(vectors)
+
+        ids = [str(i) for i in range(len(chunks))]
+        return FAISS(
+            self.embeddings,
+            index,
+            InMemoryDocstore(dict(zip(ids, chunks))),
+            dict(enumerate(ids))
+        )
         
     def retrieve(self, query: str, k: int = 3) -> List[tuple]:
         """Retrieve relevant medical context with scores"""
         if not self.vectorstore:
             return self._fallback_retrieve(query, k)
+        if self.kb_matrix is not None:
+            return self.retrieve_batch([query], k)[0]
         results = self.vectorstore.similarity_search_with_score(query, k=k)
-        return [(doc.page_content, score, doc.metadata.get("source", "unknown")) 
+        return [(doc.page_content, float(score), doc.metadata.get("source", "unknown")) 
                 for doc, score in results]
 
+    def retrieve_batch(self, queries: List[str], k: int = 3) -> List[List[tuple]]:
+        """Retrieve context for several queries with one embedding pass and one index search"""
+        if not queries:
+            return []
+        if not self.vectorstore:
+            return [self._fallback_retrieve(query, k) for query in queries]
+
+        xq = np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
+        if self.kb_matrix is not None:
+            distances, indices = self._matrix_search(xq, k)
+        else:
+            distances, indices = self.vectorstore.index.search(xq, k)
+
+        batch = []
+        for row_scores, row_ids in zip(distances, indices):
+            results = []
+            for score, i in zip(row_scores, row_ids):
+                if i == -1:  # fewer than k vectors in the index
+                    continue
+                doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i])
+                results.append((doc.page_content, float(score), doc.metadata.get("source", "unknown")))
+            batch.append(results)
+        return batch
+
+    def _matrix_search(self, xq: np.ndarray, k: int):
+        """Exact squared-L2 top-k via one matmul (same scores and order as IndexFlatL2.search)"""
+        n_docs = self.kb_matrix.shape[0]
+        k_eff = min(k, n_docs)
+        distances = self._kb_sq_norms[None, :] - 2.0 * (xq @ self.kb_matrix.T)
+        distances += np.einsum("ij,ij->i", xq, xq)[:, None]
+        np.maximum(distances, 0.0, out=distances)
+
+        out_d = np.full((len(xq), k), np.inf, dtype=np.float32)
+        out_i = np.full((len(xq), k), -1, dtype=np.int64)
+        for row, dist in enumerate(distances):
+            top = np.argpartition(dist, k_eff - 1)[:k_eff] if k_eff < n_docs else np.arange(n_docs)
+            top = top[np.lexsort((top, dist[top]))]
+            out_d[row, :k_eff] = dist[top]
+            out_i[row, :k_eff] = top
+        return out_d, out_i
+
+    def _build_term_index(self, chunks: List[Document]):
+        """Per-chunk term sets plus an inverted index of term -> ids of chunks containing it"""
+        self._doc_terms = [frozenset(tokenize(doc.page_content)) for doc in chunks]
+        self._terms_by_text = {doc.page_content: terms for doc, terms in zip(chunks, self._doc_terms)}
+        postings = {}
+        for i, terms in enumerate(self._doc_terms):
+            for term in terms:
+                postings.setdefault(term, []).append(i)
+        self._postings = {term: np.asarray(ids, dtype=np.int32) for term, ids in postings.items()}
+
+    def terms(self, text: str) -> frozenset:
+        """Token set of a text; precomputed for the knowledge base's own chunks"""
+        cached = self._terms_by_text.get(text)
+        return cached if cached is not None else frozenset(tokenize(text))
+
     def _fallback_retrieve(self, query: str, k: int) -> List[tuple]:
         """Simple keyword-overlap retrieval when embeddings aren't available."""
-        if not self.documents:
+        n_docs = len(self.documents)
+        k = min(k, n_docs)
+        if k <= 0:
             return []
 
-        q_terms = set(re.findall(r"[a-z0-9]+", query.lower()))
+        q_terms = set(tokenize(query))
         q_len = max(1, len(q_terms))
 
-        scored = []
-        for doc in self.documents:
-            d_terms = set(re.findall(r"[a-z0-9]+", doc.page_content.lower()))
-            overlap = len(q_terms & d_terms)
-            score = 1.0 - (overlap / q_len)
-            scored.append((doc.page_content, score, doc.metadata.get("source", "unknown")))
+        # Overlap per doc = how many query-term posting lists it appears in.
+        hits = [self._postings[t] for t in q_terms if t in self._postings]
+        if hits:
+            overlap = np.bincount(np.concatenate(hits), minlength=n_docs)
+        else:
+            overlap = np.zeros(n_docs, dtype=np.int64)
+        scores = 1.0 - overlap / q_len
+
+        # O(N) top-k; ties are broken by document order, as a stable sort would.
+        kth = np.partition(scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(scores <= kth)
+        top = candidates[np.lexsort((candidates, scores[candidates]))][:k]
 
-        scored.sort(key=lambda x: x[1])
-        return scored[:k]
+        return [
+            (self.documents[i].page_content, float(scores[i]), self.documents[i].metadata.get("source", "unknown"))
+            for i in top
+        ]
     
     def save(self):
         """Persist vector store"""
         if self.vectorstore:
             self.vectorstore.save_local(self.persist_dir)
+            self.embeddings.save(os.path.join(self.persist_dir, EMBEDDING_CACHE_FILE))
+            matrix_path = os.path.join(self.persist_dir, MATRIX_FILE)
+            if self.kb_matrix is not None:
+                np.save(matrix_path, self.kb_matrix)
+            elif os.path.exists(matrix_path):
+                os.remove(matrix_path)  # stale: the index is now an ANN graph
     
     def load(self):
         """Load persisted vector store"""
@@ -80,3 +293,8 @@ class MedicalKnowledgeBase:
                 self.embeddings,
                 allow_dangerous_deserialization=True
             )
+            matrix_path = os.path.join(self.persist_dir, MATRIX_FILE)
+            matrix = np.load(matrix_path) if os.path.exists(matrix_path) else None
+            if matrix is not None and len(matrix) != self.vectorstore.index.ntotal:
+                matrix = None
+            self._set_matrix(matrix)
@@ -1,5 +1,6 @@
 import os
 import argparse
+import asyncio
 from dotenv import load_dotenv
 from models import PatientContext
 from rag_system import MedicalRAGSystem
@@ -20,7 +21,7 @@ MEDICAL_KNOWLEDGE = [
 ]
 
 def run_demo(rag_system: MedicalRAGSystem, patient: PatientContext):
-    doctor_interface = DoctorInterface()
+    doctor_interface = DoctorInterface(echo=True)
 
     # Sample medical report
     sample_report = """
@@ -79,19 +80,21 @@ def run_demo(rag_system: MedicalRAGSystem, patient: PatientContext):
         if verified:
             print("\n✅ Report verified and ready for patient delivery")
 
-def run_chat(rag_system: MedicalRAGSystem, patient: PatientContext):
+async def run_chat(rag_system: MedicalRAGSystem, patient: PatientContext):
     print("\n" + "="*60)
     print("INTERACTIVE Q&A (type 'exit' to quit)")
     print("="*60)
     while True:
-        question = input("\nQuestion> ").strip()
+        question = (await asyncio.to_thread(input, "\nQuestion> ")).strip()
         if not question:
             continue
         if question.lower() in {"exit", "quit"}:
             break
-        answer, confidence, sources, uncertainties = rag_system.answer_question(question, patient)
         print("\nANSWER:")
-        print(answer)
+        answer, confidence, sources, uncertainties = await rag_system.answer_question_async(
+            question, patient, on_delta=lambda delta: print(delta, end="", flush=True)
+        )
+        print()
         print(f"\nCONFIDENCE: {confidence:.2%}")
         if uncertainties:
             print("UNCERTAINTIES:")
@@ -145,7 +148,7 @@ def main():
     if not args.chat_only:
         run_demo(rag_system, patient)
     if args.chat or args.chat_only:
-        run_chat(rag_system, patient)
+        asyncio.run(run_chat(rag_system, patient))
 
 if __name__ == "__main__":
     main()
@@ -1,82 +1,77 @@
 import os
 import re
-from openai import OpenAI
+from collections import deque
 from dotenv import load_dotenv
 from typing import List
+from scheduler import get_scheduler
+from red_flags import contains_red_flag
 
 load_dotenv()
 
+HISTORY_LENGTH = 12
+REPLY_MAX_TOKENS = 400
+FIRST_REPLY_MAX_TOKENS = 800
+
+EMERGENCY_KEYWORDS = ["chest pain", "can't breathe", "can not breathe", "cannot breathe",
+                      "severe bleeding", "unconscious", "suicide", "overdose",
+                      "heart attack", "stroke", "severe headache", "confused",
+                      "loss of consciousness", "severe abdominal pain"]
+CONDITION_KEYWORDS = ['diabetes', 'hypertension', 'asthma', 'heart disease', 'kidney disease',
+                      'liver disease', 'cancer', 'copd', 'arthritis', 'depression', 'anxiety']
+MEDICATION_KEYWORDS = ['aspirin', 'metformin', 'insulin', 'lisinopril', 'atorvastatin',
+                       'amlodipine', 'omeprazole', 'levothyroxine', 'albuterol']
+SYMPTOM_KEYWORDS = [
+    'pain', 'ache', 'fever', 'cough', 'nausea', 'vomit', 'dizzy',
+    'headache', 'fatigue', 'weakness', 'bleeding', 'rash', 'swelling',
+    'breathing', 'chest', 'stomach', 'throat', 'sore', 'hurt'
+]
+
+MEDICATION_CUES = ['taking', 'medication', 'medicine']
+SEVERITY_HIGH_KEYWORDS = ['emergency', 'immediately', 'urgent', 'call 911']
+SEVERITY_MEDIUM_KEYWORDS = ['see a doctor', 'medical attention', 'consult']
+
+# Keyword lists are matched with substring `in` tests on text the caller lowercased
+# once; for lists this short that beats a regex alternation.
+_AGE_RE = re.compile(r"\b(\d{1,3})\s*(?:years?|yrs?|yo)\b")
+_ER_RE = re.compile(r"\ber\b")  # whole word only: "er" is inside "there", "never", ...
+
 class MedicalChatbot:
     """General medical chatbot with guardrails"""
     
     def __init__(self):
         api_key = os.getenv("GROQ_API_KEY")
         model = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
-        base_url = "https://api.groq.com/openai/v1"
+        base_url = os.getenv("GROQ_BASE_URL") or "https://api.groq.com/openai/v1"
         
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.scheduler = get_scheduler(api_key, base_url)
         self.model = model
-        self.conversation_history = []
+        self.fast_model = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+        self.conversation_history = deque(maxlen=HISTORY_LENGTH)  # oldest turns fall off
         self.patient_context = {}
         self.symptoms = []  # Track symptoms for booking
         
-        self.system_prompt = """You are an empathetic medical AI assistant. Follow these rules:
-
-1. PATIENT CONTEXT:
-   - Remember patient details: age, existing conditions, medications, allergies
-   - Personalize responses based on context
-   - Ask for relevant details if missing
-
-2. SYMPTOM ASSESSMENT:
-   - Ask follow-up questions to understand symptoms better (duration, severity, triggers, associated symptoms)
-   - Use structured approach: WHEN did it start? WHERE is it? HOW severe (1-10)? WHAT makes it better/worse?
-   - Gather enough information before suggesting next steps
-
-3. RESPONSE STRUCTURE:
-   - Start with empathy: "I understand this must be concerning..."
-   - Ask clarifying questions if needed
-   - Provide clear, detailed explanation
-   - Suggest home care options (rest, hydration, OTC remedies)
-   - Recommend when to see a doctor
-   - Flag serious symptoms immediately
-
-4. APPOINTMENT BOOKING:
-   - Only help with booking when user explicitly requests it
-   - User must ask to "book appointment" or "schedule appointment"
-   - Do NOT automatically suggest booking
-   - When asked, provide helpful information about seeing a doctor
-
-5. SAFETY & GUARDRAILS:
-   - RED FLAGS (seek immediate care): chest pain, difficulty breathing, severe bleeding, sudden severe headache, confusion, loss of consciousness, severe abdominal pain, signs of stroke
-   - YELLOW FLAGS (see doctor soon): persistent fever, worsening symptoms, symptoms lasting >1 week
-   - Never diagnose or prescribe prescription medication
-   - Can suggest OTC remedies (e.g., "You might consider acetaminophen for fever, but check with pharmacist")
-
-6. HOME CARE SUGGESTIONS:
-   - Rest, hydration, nutrition
-   - OTC medications (with cautions)
-   - When to monitor symptoms
-   - Warning signs to watch for
-
-7. MULTILINGUAL:
-   - Detect and respond in user's language
-   - Maintain medical accuracy
-
-Be warm, thorough, and safety-focused."""
+        # Kept terse: it is resent on every turn. The long-form guidance lives in
+        # DOCUMENTATION.md ("Prompt Engineering").
+        self.system_prompt = """Empathetic medical assistant. Rules:
+1) Use known patient details (age, conditions, meds, allergies); ask for missing ones.
+2) Ask about duration, location, severity (1-10) and triggers before advising.
+3) Red flags (chest pain, trouble breathing, severe bleeding, sudden severe headache, confusion, fainting, severe abdominal pain, stroke signs): say to call emergency services now.
+4) See a doctor soon for persistent fever, worsening, or symptoms over a week.
+5) Never diagnose or prescribe; OTC remedies and home care are fine, with cautions.
+6) Discuss booking only if the user asks.
+7) Reply in the user's language; be warm and concise."""
 
     def chat(self, user_message: str) -> dict:
         """Process user message and return response"""
         
+        msg_lower = user_message.lower()
+        
         # Extract patient context and symptoms
-        self._extract_patient_context(user_message)
-        self._extract_symptoms(user_message)
+        self._extract_patient_context(msg_lower)
+        self._extract_symptoms(msg_lower)
         
         # Check for emergency keywords
-        emergency_keywords = ["chest pain", "can't breathe", "can not breathe", "cannot breathe",
-                            "severe bleeding", "unconscious", "suicide", "overdose", 
-                            "heart attack", "stroke", "severe headache", "confused",
-                            "loss of consciousness", "severe abdominal pain"]
-        if any(keyword in user_message.lower() for keyword in emergency_keywords):
+        if any(keyword in msg_lower for keyword in EMERGENCY_KEYWORDS):
             return {
                 "response": "🚨 **EMERGENCY ALERT**\n\nThis sounds like a medical emergency. Please:\n\n1. **Call emergency services immediately** (911 in US, 112 in EU, or your local emergency number)\n2. **Go to the nearest emergency room**, or\n3. **Call your doctor immediately**\n\nDo not wait. Seek help now.",
                 "is_emergency": True,
@@ -88,23 +83,24 @@ Be warm, thorough, and safety-focused."""
         context_info = self._build_context_string()
         enhanced_message = f"{context_info}\n\nUser message: {user_message}" if context_info else user_message
         
-        # Add to history
+        # Add to history (keeps the last HISTORY_LENGTH messages)
         self.conversation_history.append({"role": "user", "content": enhanced_message})
         
-        # Keep last 12 messages
-        if len(self.conversation_history) > 12:
-            self.conversation_history = self.conversation_history[-12:]
+        # The opening reply gets room for a full assessment; follow-ups stay short.
+        first_reply = not any(m["role"] == "assistant" for m in self.conversation_history)
         
         # Generate response
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            # Short turns without red-flag wording are answered by the fast model.
+            fast = len(user_message) < 200 and not contains_red_flag(user_message)
+            response = self.scheduler.submit(
+                model=self.fast_model if fast else self.model,
                 messages=[
                     {"role": "system", "content": self.system_prompt},
                     *self.conversation_history
                 ],
                 temperature=0.7,
-                max_tokens=800
+                max_tokens=FIRST_REPLY_MAX_TOKENS if first_reply else REPLY_MAX_TOKENS
             )
             
             assistant_message = response.choices[0].message.content
@@ -135,20 +131,16 @@ Be warm, thorough, and safety-focused."""
                 "show_booking": False
             }
     
-    def _extract_patient_context(self, message: str):
-        """Extract patient details from conversation"""
-        msg_lower = message.lower()
+    def _extract_patient_context(self, msg_lower: str):
+        """Extract patient details from a lowercased message"""
         
         # Extract age
-        import re
-        age_match = re.search(r'\b(\d{1,3})\s*(?:years?|yrs?|yo)\b', msg_lower)
+        age_match = _AGE_RE.search(msg_lower)
         if age_match:
             self.patient_context['age'] = age_match.group(1)
         
         # Extract conditions
-        conditions = ['diabetes', 'hypertension', 'asthma', 'heart disease', 'kidney disease', 
-                     'liver disease', 'cancer', 'copd', 'arthritis', 'depression', 'anxiety']
-        for condition in conditions:
+        for condition in CONDITION_KEYWORDS:
             if condition in msg_lower:
                 if 'conditions' not in self.patient_context:
                     self.patient_context['conditions'] = []
@@ -156,10 +148,8 @@ Be warm, thorough, and safety-focused."""
                     self.patient_context['conditions'].append(condition)
         
         # Extract medications
-        if 'taking' in msg_lower or 'medication' in msg_lower or 'medicine' in msg_lower:
-            med_keywords = ['aspirin', 'metformin', 'insulin', 'lisinopril', 'atorvastatin', 
-                          'amlodipine', 'omeprazole', 'levothyroxine', 'albuterol']
-            for med in med_keywords:
+        if any(cue in msg_lower for cue in MEDICATION_CUES):
+            for med in MEDICATION_KEYWORDS:
                 if med in msg_lower:
                     if 'medications' not in self.patient_context:
                         self.patient_context['medications'] = []
@@ -181,16 +171,9 @@ Be warm, thorough, and safety-focused."""
         
         return " | ".join(parts)
     
-    def _extract_symptoms(self, message: str):
-        """Extract symptoms from message"""
-        symptom_keywords = [
-            'pain', 'ache', 'fever', 'cough', 'nausea', 'vomit', 'dizzy',
-            'headache', 'fatigue', 'weakness', 'bleeding', 'rash', 'swelling',
-            'breathing', 'chest', 'stomach', 'throat', 'sore', 'hurt'
-        ]
-        
-        msg_lower = message.lower()
-        for symptom in symptom_keywords:
+    def _extract_symptoms(self, msg_lower: str):
+        """Extract symptoms from a lowercased message"""
+        for symptom in SYMPTOM_KEYWORDS:
             if symptom in msg_lower and symptom not in self.symptoms:
                 self.symptoms.append(symptom)
     
@@ -204,16 +187,16 @@ Be warm, thorough, and safety-focused."""
         """Assess severity from response"""
         response_lower = response.lower()
         
-        if any(word in response_lower for word in ['emergency', 'immediately', 'urgent', 'call 911', 'er']):
+        if any(word in response_lower for word in SEVERITY_HIGH_KEYWORDS) or _ER_RE.search(response_lower):
             return 'high'
-        elif any(word in response_lower for word in ['see a doctor', 'medical attention', 'consult']):
+        elif any(word in response_lower for word in SEVERITY_MEDIUM_KEYWORDS):
             return 'medium'
         else:
             return 'low'
     
     def reset(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
         self.patient_context = {}
         self.symptoms = []
     
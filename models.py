@@ -1,11 +1,13 @@
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field
 
 class PatientContext(BaseModel):
-    """Patient personalization context"""
+    """Patient personalization context (frozen so it can key caches)"""
+    model_config = ConfigDict(frozen=True)
+
     age: int
     medical_literacy: str = Field(description="low, medium, high")
-    existing_conditions: List[str] = Field(default_factory=list)
+    existing_conditions: Tuple[str, ...] = Field(default_factory=tuple)
     language_preference: str = "simple"
 
 class MedicalFinding(BaseModel):
@@ -0,0 +1,61 @@
+import os
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MINILM_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """MiniLM sentence embeddings served from a (quantized) ONNX export
+
+    Export and quantize once with optimum, e.g.:
+        optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 onnx-miniLM
+        optimum-cli onnxruntime quantize --onnx_model onnx-miniLM --avx2 -o onnx-miniLM-int8
+    then point EMBEDDINGS_ONNX_MODEL at onnx-miniLM-int8/model_quantized.onnx.
+    The quantize step writes only the model, so the tokenizer is read from
+    tokenizer_path (e.g. the onnx-miniLM export dir), else from the model's own
+    directory if it has one, else from the Hugging Face model id.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: str | None = None,
+        batch_size: int = 32,
+        max_length: int = 256
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        if not tokenizer_path:
+            model_dir = os.path.dirname(model_path) or "."
+            has_tokenizer = os.path.exists(os.path.join(model_dir, "tokenizer_config.json"))
+            tokenizer_path = model_dir if has_tokenizer else MINILM_MODEL_ID
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [t.replace("\n", " ") for t in texts[start:start + self.batch_size]]
+            encoded = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feed = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean-pool over real tokens, then L2-normalize (same as the sentence-transformers pipeline).
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
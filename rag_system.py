@@ -1,45 +1,151 @@
+import asyncio
+import hashlib
 import os
 import re
-from typing import List, Tuple
-from openai import OpenAI
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generator, List, Tuple
 from models import PatientContext, MedicalFinding, ExplanationOutput
-from knowledge_base import MedicalKnowledgeBase
+from knowledge_base import MedicalKnowledgeBase, tokenize
 from extractor import ReportExtractor
+from scheduler import get_scheduler
+from semantic_cache import SemanticCache
+from red_flags import contains_red_flag
+
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+GROQ_FAST_MODEL = "llama-3.1-8b-instant"
+FAST_QUESTION_CHARS = 200
+# Grounded answers need no creativity; greedy decoding with a fixed seed keeps
+# them reproducible, so cached answers match what a fresh call would return.
+DETERMINISTIC = os.getenv("LLM_DETERMINISTIC", "1").strip().lower() in {"1", "true", "yes"}
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_RANGE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*$")
+_UNIT_RE = re.compile(r"\b(mg/dl|mmhg|miu/l|ng/ml|g/dl|cells/mcl)\b")
+# A sentence (text between . ! ?) containing any uncertainty marker as a whole word.
+_SENTENCE_END_RE = re.compile(r"[.!?]")
+_UNCERTAINTY_RE = re.compile(r"\b(?:unclear|uncertain|may|might|possibly|not enough information)\b", re.IGNORECASE)
+_MEDICAL_KEYWORDS = frozenset({
+    "hemoglobin", "glucose", "cholesterol", "creatinine", "wbc", "white", "blood",
+    "pressure", "tsh", "alt", "hba1c", "vitamin", "lab", "range", "anemia",
+    "diabetes", "infection", "kidney", "liver", "thyroid", "test", "result",
+    "report", "panel", "count", "symptom", "diagnosis", "pain", "ache", "stomach",
+    "nausea", "vomit", "fever", "cough", "headache", "dizzy", "fatigue", "sick",
+    "hurt", "sore", "swelling", "rash", "breathing", "chest", "heart", "medical",
+    "health", "doctor", "treatment", "medication", "disease", "condition"
+})
+
+_LITERACY_MAP = {
+    "low": "very simple terms, avoid medical jargon",
+    "medium": "clear language with some medical terms explained",
+    "high": "technical medical terminology is acceptable"
+}
+
+_EXPLAIN_PROMPT = """You are a medical AI assistant. Explain this report using ONLY the provided medical knowledge.
+
+MEDICAL KNOWLEDGE BASE:
+{context}
+
+REPORT FINDINGS:
+{findings}
+
+PATIENT CONTEXT:
+- Age: {age}
+- Medical literacy: {literacy}
+- Existing conditions: {conditions}
+
+INSTRUCTIONS:
+1. Explain findings using ONLY information from the knowledge base
+2. Use {literacy}
+3. If uncertain, explicitly state "This is unclear from available information"
+4. Personalize for age {age} and conditions: {conditions}
+5. Be concise but complete
+
+Provide explanation:"""
+
+def _sampling(temperature: float) -> dict:
+    """Sampling parameters for a grounded completion"""
+    if DETERMINISTIC:
+        return {"temperature": 0, "seed": 1}
+    return {"temperature": temperature}
 
 class MedicalRAGSystem:
     """Main RAG system with hallucination control"""
     
-    def __init__(self, api_key: str, model: str, base_url: str | None = None):
-        client_kwargs = {"api_key": api_key}
-        if base_url:
-            client_kwargs["base_url"] = base_url
-        self.client = OpenAI(**client_kwargs)
+    def __init__(self, api_key: str, model: str, base_url: str | None = None, fast_model: str | None = None):
+        self.scheduler = get_scheduler(api_key, base_url)
         self.model = model
+        self.quality_model = model  # critical reports and red-flag questions
+        # Everything else. The Groq default doesn't exist on other providers, so
+        # elsewhere fall back to the main model unless LLM_FAST_MODEL says otherwise.
+        self.fast_model = fast_model or os.getenv("LLM_FAST_MODEL") or (
+            GROQ_FAST_MODEL if "groq.com" in (base_url or "") else model
+        )
         self.kb = MedicalKnowledgeBase()
         self.extractor = ReportExtractor()
+        self._report_cache = OrderedDict()
+        self._report_cache_lock = threading.Lock()
+        self.answer_cache = SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD)
+        self._pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="rag")
         
     def initialize_knowledge_base(self, medical_sources: List[str]):
         """Load medical knowledge base"""
         self.kb.load_medical_sources(medical_sources)
         self.kb.save()
+        # Cached explanations were grounded in the old knowledge base.
+        with self._report_cache_lock:
+            self._report_cache.clear()
+        self.answer_cache.clear()
     
     def process_report(
         self, 
         report_text: str, 
         patient_context: PatientContext
     ) -> ExplanationOutput:
-        """Process medical report with RAG"""
+        """Process medical report with RAG, reusing results for repeated reports"""
+        key = (hashlib.sha256(report_text.encode("utf-8")).hexdigest(), patient_context)
+        with self._report_cache_lock:
+            cached = self._report_cache.get(key)
+            if cached is not None:
+                self._report_cache.move_to_end(key)
         
-        # 1. Extract structured findings
-        findings = self.extractor.extract_findings(report_text)
+        if cached is None:
+            cached = self._process_report(report_text, patient_context)
+            with self._report_cache_lock:
+                self._report_cache[key] = cached
+                while len(self._report_cache) > REPORT_CACHE_SIZE:
+                    self._report_cache.popitem(last=False)
+        
+        # Hand out copies: callers (e.g. doctor review) mutate the output.
+        return cached.model_copy(deep=True)
+    
+    def _process_report(
+        self, 
+        report_text: str, 
+        patient_context: PatientContext
+    ) -> ExplanationOutput:
+        """Run extraction, retrieval and generation for a report"""
         
-        # 2. Retrieve relevant medical knowledge
-        retrieved_context = self.kb.retrieve(report_text, k=3)
+        # 1-2. Retrieve relevant medical knowledge on the pool (embedding and FAISS
+        # release the GIL) while extracting structured findings on this thread
+        retrieval = self._pool.submit(self.kb.retrieve, report_text, 3)
+        findings = self.extractor.extract_findings(report_text)
+        retrieved_context = retrieval.result()
         
-        # 3. Generate grounded explanation
-        explanation, confidence, uncertainties = self._generate_explanation(
-            report_text, findings, retrieved_context, patient_context
-        )
+        # 3. Generate grounded explanation. An all-normal report whose findings are
+        # each named in retrieved knowledge is explained offline, without the LLM.
+        if self._explainable_offline(findings, retrieved_context, patient_context):
+            offline_requested = os.getenv("LLM_OFFLINE", "").strip().lower() in {"1", "true", "yes"}
+            explanation, confidence, uncertainties = self._generate_offline_explanation(
+                findings, retrieved_context, patient_context, forced=offline_requested
+            )
+        else:
+            model = self.quality_model if any(f.severity == "critical" for f in findings) else self.fast_model
+            explanation, confidence, uncertainties = self._generate_explanation(
+                report_text, findings, retrieved_context, patient_context, model
+            )
         
         # 4. Determine if doctor review needed
         requires_review = self._needs_doctor_review(findings, confidence)
@@ -54,59 +160,77 @@ class MedicalRAGSystem:
             requires_doctor_review=requires_review
         )
     
+    def _explainable_offline(
+        self,
+        findings: List[MedicalFinding],
+        context: List[Tuple[str, float, str]],
+        patient: PatientContext
+    ) -> bool:
+        """True when every finding is verifiably normal and named in a retrieved doc.
+
+        Low-literacy patients always get the LLM's plain-language explanation,
+        since the retrieved docs are quoted verbatim.
+        """
+        if not findings or patient.medical_literacy == "low":
+            return False
+        docs = [doc.lower() for doc, _, _ in context]
+        return all(
+            self._verified_normal(f) and any(f.finding.lower() in doc for doc in docs)
+            for f in findings
+        )
+
+    def _verified_normal(self, finding: MedicalFinding) -> bool:
+        """Normal by its own value and range, or by an explicit "normal" keyword.
+
+        The extractor's "normal" is also its fallback when no keyword matched,
+        which alone says nothing about an out-of-range value.
+        """
+        if finding.severity != "normal":
+            return False
+        range_match = _RANGE_RE.match(finding.normal_range or "")
+        if finding.value and range_match:
+            try:
+                value = float(finding.value)
+            except ValueError:
+                return False
+            low, high = float(range_match.group(1)), float(range_match.group(2))
+            return low <= value <= high
+        return "normal" in self.extractor._scan_severities(finding.finding)
+
     def _generate_explanation(
         self,
         report: str,
         findings: List[MedicalFinding],
         context: List[Tuple[str, float, str]],
-        patient: PatientContext
+        patient: PatientContext,
+        model: str
     ) -> Tuple[str, float, List[str]]:
         """Generate personalized explanation with uncertainty tracking"""
 
         offline_requested = os.getenv("LLM_OFFLINE", "").strip().lower() in {"1", "true", "yes"}
         
-        literacy_map = {
-            "low": "very simple terms, avoid medical jargon",
-            "medium": "clear language with some medical terms explained",
-            "high": "technical medical terminology is acceptable"
-        }
-        
         context_text = "\n".join([f"- {doc}" for doc, _, _ in context])
         findings_text = "\n".join([f"- {f.finding}: {f.value or 'observed'} ({f.severity})" 
                                    for f in findings])
         
-        prompt = f"""You are a medical AI assistant. Explain this report using ONLY the provided medical knowledge.
-
-MEDICAL KNOWLEDGE BASE:
-{context_text}
-
-REPORT FINDINGS:
-{findings_text}
-
-PATIENT CONTEXT:
-- Age: {patient.age}
-- Medical literacy: {literacy_map[patient.medical_literacy]}
-- Existing conditions: {', '.join(patient.existing_conditions) or 'None'}
-
-INSTRUCTIONS:
-1. Explain findings using ONLY information from the knowledge base
-2. Use {literacy_map[patient.medical_literacy]}
-3. If uncertain, explicitly state "This is unclear from available information"
-4. Personalize for age {patient.age} and conditions: {patient.existing_conditions}
-5. Be concise but complete
-
-Provide explanation:"""
+        prompt = _EXPLAIN_PROMPT.format(
+            context=context_text,
+            findings=findings_text,
+            age=patient.age,
+            literacy=_LITERACY_MAP[patient.medical_literacy],
+            conditions=', '.join(patient.existing_conditions) or 'None'
+        )
 
         if offline_requested:
             return self._generate_offline_explanation(findings, context, patient)
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        response = self.scheduler.submit(
+            model=model,
             messages=[
                 {"role": "system", "content": "You are a medical explanation assistant. Only use provided sources. Mark uncertainties clearly."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3
+            **_sampling(0.3)
         )
         
         explanation = response.choices[0].message.content
@@ -123,22 +247,99 @@ Provide explanation:"""
     def answer_question(
         self,
         question: str,
-        patient: PatientContext
+        patient: PatientContext,
+        stream: bool = False
+    ):
+        """Answer a free-form question using only the retrieved knowledge base.
+
+        Returns (answer, confidence, sources, uncertainties). With stream=True, returns
+        a generator of answer text deltas whose return value is that tuple.
+        """
+        answer = self._answer_question(question, patient, stream)
+        if stream:
+            return answer
+        while True:
+            try:
+                next(answer)
+            except StopIteration as done:
+                return done.value
+
+    async def answer_question_async(
+        self,
+        question: str,
+        patient: PatientContext,
+        on_delta: Callable[[str], None] | None = None
     ) -> Tuple[str, float, List[str], List[str]]:
-        """Answer a free-form question using only the retrieved knowledge base."""
+        """Async answer_question; with on_delta, the answer text is streamed to it as it arrives."""
+        loop = asyncio.get_running_loop()
+        # Embedding and retrieval are blocking, so they run on the worker pool.
+        result, job = await loop.run_in_executor(self._pool, self._prepare_answer, question, patient)
+        if result is not None:
+            if on_delta:
+                on_delta(result[0])
+            return result
+
+        if on_delta:
+            parts = []
+            async for delta in self.scheduler.stream_async(**job["request"]):
+                parts.append(delta)
+                on_delta(delta)
+            answer = "".join(parts)
+        else:
+            response = await self.scheduler.submit_async(**job["request"])
+            answer = response.choices[0].message.content
+        return self._finish_answer(job, answer)
+
+    def _answer_question(
+        self,
+        question: str,
+        patient: PatientContext,
+        stream: bool
+    ) -> Generator[str, None, Tuple[str, float, List[str], List[str]]]:
+        """Yield answer text as it is produced, then return the full result"""
+        result, job = self._prepare_answer(question, patient)
+        if result is not None:
+            yield result[0]
+            return result
+
+        if stream:
+            parts = []
+            for delta in self.scheduler.stream(**job["request"]):
+                parts.append(delta)
+                yield delta
+            answer = "".join(parts)
+        else:
+            answer = self.scheduler.submit(**job["request"]).choices[0].message.content
+            yield answer
+        return self._finish_answer(job, answer)
+
+    def _prepare_answer(self, question: str, patient: PatientContext) -> Tuple[tuple | None, dict | None]:
+        """Scope check, semantic cache, retrieval and prompt building.
 
+        Returns (result, None) when no LLM call is needed, otherwise (None, job) for _finish_answer.
+        """
         if not self._is_medical_question(question):
             msg = (
                 "I can answer questions about medical reports, lab values, and findings. "
                 "Please ask a medical question (e.g., about a lab value, range, or symptom)."
             )
-            return msg, 0.0, [], ["Outside medical scope"]
+            return (msg, 0.0, [], ["Outside medical scope"]), None
+
+        offline_requested = os.getenv("LLM_OFFLINE", "").strip().lower() in {"1", "true", "yes"}
+
+        # Near-duplicate questions from the same patient reuse an earlier LLM answer.
+        cache_vector = None
+        cache_namespace = self._answer_cache_namespace(question, patient)
+        if not offline_requested and self.kb.embeddings:
+            cache_vector = self.kb.embeddings.embed_query(question)
+            cached = self.answer_cache.lookup(cache_namespace, cache_vector)
+            if cached is not None:
+                answer, confidence, sources, uncertainties = cached
+                return (answer, confidence, list(sources), list(uncertainties)), None
 
         context = self.kb.retrieve(question, k=3)
         sources = [src for _, _, src in context]
 
-        offline_requested = os.getenv("LLM_OFFLINE", "").strip().lower() in {"1", "true", "yes"}
-
         context_text = "\n".join([f"- {doc}" for doc, _, _ in context])
         prompt = f"""You are a medical AI assistant. Answer the question using ONLY the provided medical knowledge.
 
@@ -162,36 +363,66 @@ Provide answer:"""
 
         if offline_requested:
             answer, confidence, uncertainties = self._generate_offline_answer(question, context, patient)
-            return answer, confidence, sources, uncertainties
+            return (answer, confidence, sources, uncertainties), None
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        request = dict(
+            model=self._pick_question_model(question),
             messages=[
                 {"role": "system", "content": "You are a medical explanation assistant. Only use provided sources. Mark uncertainties clearly."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.2
+            **_sampling(0.2)
         )
-        answer = response.choices[0].message.content
+        return None, {
+            "request": request,
+            "context": context,
+            "sources": sources,
+            "cache_namespace": cache_namespace,
+            "cache_vector": cache_vector
+        }
+
+    def _finish_answer(self, job: dict, answer: str) -> Tuple[str, float, List[str], List[str]]:
+        """Score an LLM answer and remember it in the semantic cache"""
+        context, sources = job["context"], job["sources"]
         uncertainties = self._extract_uncertainties(answer)
         avg_retrieval_score = sum(score for _, score, _ in context) / len(context) if context else 0
         confidence = max(0.0, min(1.0, (1 - avg_retrieval_score) * (1 - len(uncertainties) * 0.1)))
+        if job["cache_vector"] is not None:
+            self.answer_cache.add(
+                job["cache_namespace"], job["cache_vector"], (answer, confidence, tuple(sources), tuple(uncertainties))
+            )
         return answer, confidence, sources, uncertainties
 
+    def _pick_question_model(self, question: str) -> str:
+        """Short, low-risk questions go to the fast model"""
+        if len(question) < FAST_QUESTION_CHARS and not contains_red_flag(question):
+            return self.fast_model
+        return self.quality_model
+
+    def _answer_cache_namespace(self, question: str, patient: PatientContext) -> tuple:
+        """Semantic cache partition: answers only transfer between questions about the same numbers"""
+        return (patient, tuple(_NUMBER_RE.findall(question)))
+
     def _generate_offline_explanation(
         self,
         findings: List[MedicalFinding],
         context: List[Tuple[str, float, str]],
-        patient: PatientContext
+        patient: PatientContext,
+        forced: bool = True
     ) -> Tuple[str, float, List[str]]:
-        """Generate a deterministic, offline explanation using retrieved context only."""
+        """Generate a deterministic, offline explanation using retrieved context only.
+
+        forced is False when the explanation stands in for the LLM on its own
+        (all-normal reports), in which case the offline-mode banner is omitted.
+        """
 
         lines: List[str] = []
         uncertainties: List[str] = []
 
-        lines.append(
-            "Offline mode: using retrieved medical knowledge only; no external LLM calls were made."
-        )
+        if forced:
+            lines.append(
+                "Offline mode: using retrieved medical knowledge only; no external LLM calls were made."
+            )
         lines.append(
             f"Patient context: age {patient.age}; conditions: {', '.join(patient.existing_conditions) or 'None'}."
         )
@@ -255,15 +486,14 @@ Provide answer:"""
         if not context:
             return None
 
-        f_terms = set(re.findall(r"[a-z0-9]+", finding_text.lower()))
+        f_terms = self.kb.terms(finding_text)
         if not f_terms:
             return None
 
         best_doc = None
         best_overlap = 0
         for doc, _, _ in context:
-            d_terms = set(re.findall(r"[a-z0-9]+", doc.lower()))
-            overlap = len(f_terms & d_terms)
+            overlap = len(f_terms & self.kb.terms(doc))
             if overlap > best_overlap:
                 best_overlap = overlap
                 best_doc = doc
@@ -273,31 +503,18 @@ Provide answer:"""
     def _is_medical_question(self, question: str) -> bool:
         """Lightweight heuristic to detect medical-domain questions."""
         q = question.lower()
-        if re.search(r"\b(mg/dl|mmhg|miu/l|ng/ml|g/dl|cells/mcl)\b", q):
+        if _UNIT_RE.search(q):
             return True
-
-        tokens = set(re.findall(r"[a-z0-9]+", q))
-        medical_keywords = {
-            "hemoglobin", "glucose", "cholesterol", "creatinine", "wbc", "white", "blood",
-            "pressure", "tsh", "alt", "hba1c", "vitamin", "lab", "range", "anemia",
-            "diabetes", "infection", "kidney", "liver", "thyroid", "test", "result",
-            "report", "panel", "count", "symptom", "diagnosis", "pain", "ache", "stomach",
-            "nausea", "vomit", "fever", "cough", "headache", "dizzy", "fatigue", "sick",
-            "hurt", "sore", "swelling", "rash", "breathing", "chest", "heart", "medical",
-            "health", "doctor", "treatment", "medication", "disease", "condition"
-        }
-        return bool(tokens & medical_keywords)
+        # Exact hash probes per token, stopping at the first medical term.
+        return not _MEDICAL_KEYWORDS.isdisjoint(tokenize(q))
     
     def _extract_uncertainties(self, text: str) -> List[str]:
         """Extract uncertainty statements"""
-        uncertainty_markers = ["unclear", "uncertain", "may", "might", "possibly", "not enough information"]
-        uncertainties = []
-        
-        for sentence in text.split('.'):
-            if any(marker in sentence.lower() for marker in uncertainty_markers):
-                uncertainties.append(sentence.strip())
-        
-        return uncertainties
+        return [
+            sentence.strip()
+            for sentence in _SENTENCE_END_RE.split(text)
+            if _UNCERTAINTY_RE.search(sentence)
+        ]
     
     def _generate_summary(self, findings: List[MedicalFinding]) -> str:
         """Generate brief summary"""
@@ -0,0 +1,14 @@
+import re
+
+# Emergency / high-risk wording. Messages containing any of these are never
+# routed to the fast model.
+RED_FLAG_RE = re.compile(
+    r"chest pain|can'?t breathe|can ?not breathe|short(?:ness)? of breath|heart attack|stroke|"
+    r"seizure|unconscious|consciousness|faint|confus|severe|bleeding|suicid|overdose|"
+    r"critical|urgent|emergency",
+    re.IGNORECASE
+)
+
+def contains_red_flag(text: str) -> bool:
+    """Check for emergency / high-risk wording"""
+    return RED_FLAG_RE.search(text) is not None
@@ -0,0 +1,210 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable, Dict, Iterator, Tuple
+import httpx
+import orjson
+from openai import DEFAULT_TIMEOUT, AsyncOpenAI
+
+MAX_BATCH = int(os.getenv("LLM_MAX_BATCH", "16"))
+# Extra wait for stragglers after draining the queue; 0 dispatches at once.
+BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "0"))
+# Requests allowed in flight at once; size to the account's RPM quota.
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "30"))
+# Account quotas (requests / tokens per minute); 0 disables the limit.
+RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "0"))
+TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "0"))
+# Completion budget assumed for requests that don't set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 512
+
+class TokenBucket:
+    """Async token bucket holding one minute of quota, refilled continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = None
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` units are available, then take them"""
+        # A request larger than the whole bucket waits for a full bucket instead of forever.
+        amount = min(amount, self.capacity)
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.updated is not None:
+                self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.level >= amount:
+                self.level -= amount
+                return
+            await asyncio.sleep((amount - self.level) / self.rate)
+
+def estimate_tokens(kwargs: dict) -> int:
+    """Rough token cost of a chat request: ~4 characters per prompt token plus the completion budget"""
+    prompt_chars = sum(len(m.get("content") or "") for m in kwargs.get("messages", ()))
+    return prompt_chars // 4 + kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+
+class ORJSONAsyncClient(httpx.AsyncClient):
+    """httpx client that encodes JSON request bodies (prompts, chat history) with orjson"""
+
+    def build_request(self, method, url, *, json=None, **kwargs) -> httpx.Request:
+        if json is not None and kwargs.get("content") is None:
+            try:
+                kwargs["content"] = orjson.dumps(json)
+            except TypeError:
+                pass  # let httpx's stdlib encoder handle what orjson can't
+            else:
+                headers = httpx.Headers(kwargs.get("headers"))
+                headers.setdefault("Content-Type", "application/json")
+                kwargs["headers"] = headers
+                json = None
+        return super().build_request(method, url, json=json, **kwargs)
+
+class BatchScheduler:
+    """Micro-batch chat completion requests onto one shared async client"""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        max_batch: int = MAX_BATCH,
+        window_ms: float = BATCH_WINDOW_MS,
+        max_concurrency: int = MAX_CONCURRENCY,
+        rpm_limit: float = RPM_LIMIT,
+        tpm_limit: float = TPM_LIMIT
+    ):
+        self.client = client
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.max_concurrency = max_concurrency
+        self._rpm = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self._tpm = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._slots = None
+        self._inflight = set()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="llm-scheduler", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def submit(self, **kwargs):
+        """Queue a completion request and block until it finishes"""
+        return self._enqueue(kwargs).result()
+
+    async def submit_async(self, **kwargs):
+        """Queue a completion request from any event loop"""
+        return await asyncio.wrap_future(self._enqueue(kwargs))
+
+    def stream(self, **kwargs) -> Iterator[str]:
+        """Run a streaming completion on the scheduler loop, yielding content deltas as they arrive"""
+        deltas = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._stream(kwargs, deltas.put), self._loop)
+        while (delta := deltas.get()) is not None:
+            yield delta
+        future.result()  # re-raise API errors
+
+    async def stream_async(self, **kwargs) -> AsyncIterator[str]:
+        """stream() for callers on another event loop"""
+        loop = asyncio.get_running_loop()
+        deltas = asyncio.Queue()
+        put = lambda delta: loop.call_soon_threadsafe(deltas.put_nowait, delta)
+        future = asyncio.run_coroutine_threadsafe(self._stream(kwargs, put), self._loop)
+        while (delta := await deltas.get()) is not None:
+            yield delta
+        await asyncio.wrap_future(future)
+
+    async def _admit(self, kwargs: dict):
+        """Wait for RPM/TPM quota before sending a request"""
+        if self._rpm:
+            await self._rpm.acquire()
+        if self._tpm:
+            await self._tpm.acquire(estimate_tokens(kwargs))
+
+    async def _stream(self, kwargs: dict, put: Callable[[str | None], None]):
+        # Streams skip the batch window: the point is to get the first token out early.
+        try:
+            await self._admit(kwargs)
+            async with self._slots:
+                response = await self.client.chat.completions.create(stream=True, **kwargs)
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        put(chunk.choices[0].delta.content)
+        finally:
+            put(None)
+
+    def _enqueue(self, kwargs: dict) -> Future:
+        future = Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (kwargs, future))
+        return future
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._loop.create_task(self._collect())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _collect(self):
+        """Gather up to max_batch requests or until the window closes, then dispatch"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch:
+                # Take whatever is already queued without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Don't await the batch here, or a slow completion would hold up the next window.
+            task = asyncio.gather(*(self._dispatch(kwargs, future) for kwargs, future in batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, kwargs: dict, future: Future):
+        try:
+            await self._admit(kwargs)
+            async with self._slots:
+                result = await self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+
+_SCHEDULERS: Dict[Tuple[str, str], BatchScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+def get_scheduler(api_key: str, base_url: str | None = None) -> BatchScheduler:
+    """Return the process-wide scheduler for an API key/base URL pair
+
+    Every MedicalRAGSystem and MedicalChatbot goes through here, so one client
+    (and its pooled, already-handshaken HTTPS connections) serves them all.
+    """
+    base_url = (base_url or "").rstrip("/")
+    key = (api_key or "", base_url)
+    with _SCHEDULERS_LOCK:
+        if key not in _SCHEDULERS:
+            # Same timeout/limits/redirects as the SDK's default client.
+            http_client = ORJSONAsyncClient(
+                timeout=DEFAULT_TIMEOUT,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                follow_redirects=True
+            )
+            client_kwargs = {"api_key": api_key, "http_client": http_client}
+            if base_url:
+                client_kwargs["base_url"] = base_url
+            _SCHEDULERS[key] = BatchScheduler(AsyncOpenAI(**client_kwargs))
+        return _SCHEDULERS[key]
@@ -0,0 +1,84 @@
+import threading
+from typing import Any, Hashable, List, Optional
+import numpy as np
+from cachetools import TTLCache
+
+class _Bucket:
+    """Ring of unit vectors kept as one contiguous matrix, grown geometrically up to capacity"""
+
+    def __init__(self, capacity: int, dim: int):
+        self.capacity = capacity
+        # Most namespaces only ever hold one entry, so start with a single row.
+        self.vectors = np.empty((1, dim), dtype=np.float32)
+        self.values = []
+        self.next = 0  # slot to overwrite once full
+
+    @property
+    def size(self) -> int:
+        return len(self.values)
+
+    def add(self, vector: np.ndarray, value: Any):
+        n = len(self.values)
+        if n < self.capacity:
+            if n == len(self.vectors):
+                grown = np.empty((min(2 * n, self.capacity), self.vectors.shape[1]), dtype=np.float32)
+                grown[:n] = self.vectors
+                self.vectors = grown
+            self.vectors[n] = vector
+            self.values.append(value)
+        else:
+            self.vectors[self.next] = vector
+            self.values[self.next] = value
+            self.next = (self.next + 1) % self.capacity
+
+class SemanticCache:
+    """Response cache matched by cosine similarity of query embeddings
+
+    Entries are partitioned by a namespace (e.g. patient context plus any numbers
+    in the query), so a near-duplicate phrasing only hits when everything that
+    changes the answer is identical.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_namespaces: int = 1024, per_namespace: int = 64, ttl: float = 3600):
+        self.threshold = threshold
+        self.per_namespace = per_namespace
+        self._buckets = TTLCache(maxsize=max_namespaces, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def lookup(self, namespace: Hashable, vector: List[float]) -> Optional[Any]:
+        """Return the value of the most similar entry above threshold, or None"""
+        q = self._normalize(vector)
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is not None and bucket.size and bucket.vectors.shape[1] == q.shape[0]:
+                # One matrix-vector product over the whole bucket, no per-lookup stacking.
+                scores = bucket.vectors[:bucket.size] @ q
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    return bucket.values[best]
+            self.misses += 1
+            return None
+
+    def add(self, namespace: Hashable, vector: List[float], value: Any):
+        """Store a value under its query embedding"""
+        v = self._normalize(vector)
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is None or bucket.vectors.shape[1] != v.shape[0]:
+                bucket = _Bucket(self.per_namespace, v.shape[0])
+            bucket.add(v, value)
+            # Re-inserting restarts the namespace's TTL.
+            self._buckets[namespace] = bucket
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
@@ -0,0 +1,51 @@
+import math
+import threading
+from typing import Any, Callable, Hashable, Optional
+from cachetools import TTLCache
+
+class ShardedSessionMap:
+    """Session map split across independently locked TTL shards"""
+
+    def __init__(self, shards: int = 32, maxsize: int = 10000, ttl: float = 3600):
+        # A full shard evicts live sessions even while the map as a whole is under
+        # maxsize, so only shard maps big enough to spread evenly (~256 sessions
+        # per shard) and give each shard 50% headroom over its even share.
+        shards = max(1, min(shards, maxsize // 256))
+        per_shard = maxsize if shards == 1 else math.ceil(maxsize / shards * 1.5)
+        self.shards = [(TTLCache(maxsize=per_shard, ttl=ttl), threading.RLock()) for _ in range(shards)]
+
+    def _bucket(self, key: Hashable):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the stored value or None"""
+        store, lock = self._bucket(key)
+        with lock:
+            return store.get(key)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the stored value, creating it with factory if missing"""
+        store, lock = self._bucket(key)
+        with lock:
+            value = store.get(key)
+            if value is None:
+                value = factory()
+            # Re-inserting restarts the TTL, so active sessions don't expire.
+            store[key] = value
+            return value
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove and return the stored value, or None"""
+        store, lock = self._bucket(key)
+        with lock:
+            return store.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        total = 0
+        for store, lock in self.shards:
+            with lock:
+                total += len(store)
+        return total
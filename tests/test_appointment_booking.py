@@ -0,0 +1,26 @@
+import unittest
+
+from appointment_booking import AppointmentBooking
+
+
+class SuggestSpecialtyTest(unittest.TestCase):
+    """suggest_specialty matches keywords case-insensitively without Unicode folds"""
+
+    def setUp(self):
+        self.booking = AppointmentBooking()
+
+    def test_matches_keywords_case_insensitively(self):
+        self.assertEqual(self.booking.suggest_specialty(["Skin rash"], []), "Dermatologist")
+        self.assertEqual(self.booking.suggest_specialty([], ["Type 2 DIABETES"]), "Endocrinologist")
+
+    def test_conditions_take_priority_over_symptoms(self):
+        self.assertEqual(self.booking.suggest_specialty(["headache"], ["asthma"]), "Pulmonologist")
+
+    def test_unicode_case_folds_do_not_match(self):
+        # 'ſ' (long s) and 'ı' (dotless i) fold to 's' / 'i' under Unicode IGNORECASE.
+        self.assertEqual(self.booking.suggest_specialty(["ſkin rash"], []), "General Physician")
+        self.assertEqual(self.booking.suggest_specialty([], ["dıabetes"]), "General Physician")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+import numpy as np
+from flask import Flask
+
+from json_provider import ORJSONProvider
+
+
+class ORJSONProviderTest(unittest.TestCase):
+    """orjson must accept everything the stdlib provider did"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = ORJSONProvider(self.app)
+
+    def test_dumps_numpy_scalars(self):
+        payload = {"score": np.float64(0.25), "rank": np.int64(2), "hit": np.float32(0.5)}
+        self.assertEqual(self.app.json.loads(self.app.json.dumps(payload)), {"score": 0.25, "rank": 2, "hit": 0.5})
+
+    def test_response_serializes_numpy_float(self):
+        with self.app.app_context():
+            response = self.app.json.response({"confidence": np.float64(0.75)})
+        self.assertEqual(response.get_json(), {"confidence": 0.75})
+
+
+if __name__ == "__main__":
+    unittest.main()
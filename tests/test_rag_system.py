@@ -0,0 +1,39 @@
+import unittest
+
+from extractor import ReportExtractor
+from models import PatientContext
+from rag_system import MedicalRAGSystem
+
+HEMOGLOBIN_DOC = (
+    "Hemoglobin (Hb) normal range: 13.5-17.5 g/dL for men, 12.0-15.5 g/dL for women. "
+    "Low hemoglobin indicates anemia, which can cause fatigue and weakness.",
+    0.2,
+    "kb",
+)
+
+
+class ExplainableOfflineTest(unittest.TestCase):
+    """The all-normal shortcut must only skip the LLM for verifiably normal reports"""
+
+    def setUp(self):
+        # Only the extractor is needed; skip the scheduler and knowledge base.
+        self.rag = MedicalRAGSystem.__new__(MedicalRAGSystem)
+        self.rag.extractor = ReportExtractor()
+        self.patient = PatientContext(age=40, medical_literacy="medium")
+
+    def explainable(self, report_text):
+        findings = self.rag.extractor.extract_findings(report_text)
+        return self.rag._explainable_offline(findings, [HEMOGLOBIN_DOC], self.patient)
+
+    def test_out_of_range_value_without_keyword_goes_to_llm(self):
+        self.assertFalse(self.explainable("Hemoglobin: 6.1 (13.5-17.5)"))
+
+    def test_in_range_value_is_explained_offline(self):
+        self.assertTrue(self.explainable("Hemoglobin: 14.2 (13.5-17.5)"))
+
+    def test_value_without_range_needs_normal_keyword(self):
+        self.assertFalse(self.explainable("Hemoglobin: 14.2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
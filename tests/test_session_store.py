@@ -0,0 +1,34 @@
+import unittest
+import uuid
+
+from session_store import ShardedSessionMap
+
+
+class ShardedSessionMapTest(unittest.TestCase):
+    """Sessions are only evicted once the map as a whole is full"""
+
+    def assert_all_survive(self, maxsize):
+        sessions = ShardedSessionMap(maxsize=maxsize)
+        keys = [str(uuid.uuid4()) for _ in range(maxsize)]
+        for key in keys:
+            sessions.get_or_create(key, object)
+        self.assertEqual(len(sessions), maxsize)
+        self.assertTrue(all(key in sessions for key in keys))
+
+    def test_maxsize_sessions_all_survive(self):
+        self.assert_all_survive(10000)
+
+    def test_small_maps_are_not_sharded(self):
+        self.assert_all_survive(100)
+        self.assertEqual(len(ShardedSessionMap(maxsize=100).shards), 1)
+
+    def test_pop_removes_session(self):
+        sessions = ShardedSessionMap(maxsize=10)
+        value = sessions.get_or_create("a", object)
+        self.assertIs(sessions.get_or_create("a", object), value)
+        self.assertIs(sessions.pop("a"), value)
+        self.assertNotIn("a", sessions)
+
+
+if __name__ == "__main__":
+    unittest.main()